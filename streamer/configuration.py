@@ -458,7 +458,8 @@ RuntimeMapSubclass = TypeVar('RuntimeMapSubclass', bound='RuntimeMap')
 
 # This decorator makes it so that we only have to implement __eq__ and __lt__
 # to make the instances sortable.  These magic methods in turn depend on
-# _sortable_properties, which subclasses must implement.
+# sort_key, and through it on _sortable_properties, which subclasses must
+# implement.
 @functools.total_ordering
 class RuntimeMap(Generic[RuntimeMapSubclass], Base):
   """Maintains a map of keys to specific instances from the config file.
@@ -475,6 +476,8 @@ class RuntimeMap(Generic[RuntimeMapSubclass], Base):
 
   _map: Dict[str, RuntimeMapSubclass] = {}
 
+  # The values of _map, sorted once by set_map.
+  _sorted_values: Tuple[RuntimeMapSubclass, ...] = ()
 
   def get_key(self) -> str:
     """This defines the synthetic 'get_key' property which will be attached to
@@ -492,11 +495,17 @@ class RuntimeMap(Generic[RuntimeMapSubclass], Base):
     """Return a tuple of sortable properties.  Implemented by subclasses."""
     raise RuntimeError('_sortable_properties missing on RuntimeMapSubclass!')
 
+  def sort_key(self) -> Tuple:
+    """Return the key these values are ordered by.  Passing this as the key to
+    sorted() compares plain tuples instead of calling __lt__ on each
+    comparison."""
+    return self._sortable_properties()
+
   def __eq__(self, other: Any) -> bool:
-    return self._sortable_properties() == other._sortable_properties()
+    return self.sort_key() == other.sort_key()
 
   def __lt__(self, other: Any) -> bool:
-    return self._sortable_properties() < other._sortable_properties()
+    return self.sort_key() < other.sort_key()
 
   def __hash__(self) -> int:
       return super().__hash__()
@@ -508,6 +517,10 @@ class RuntimeMap(Generic[RuntimeMapSubclass], Base):
 
     assert cls != RuntimeMap, 'Do not use the base class directly!'
     cls._map = map
+    # The map only changes here, so sort its values once rather than on every
+    # call to sorted_values.  Sort on the tuples directly, so each value's
+    # properties are computed once instead of on every comparison.
+    cls._sorted_values = tuple(sorted(map.values(), key=cls.sort_key))
 
     # Synthesize a method on each value to allow the key to be recovered.
     # Use a default parameter in the lambda to effectively bind the parameter,
@@ -534,8 +547,10 @@ class RuntimeMap(Generic[RuntimeMapSubclass], Base):
     return cls._map.keys()
 
   @classmethod
-  def sorted_values(cls) -> List[RuntimeMapSubclass]:
-    return sorted(cls._map.values())
+  def sorted_values(cls) -> Tuple[RuntimeMapSubclass, ...]:
+    """Returns the values of the map, sorted.  The tuple is shared between
+    calls."""
+    return cls._sorted_values
 
 
 class RuntimeMapKeyValidator(ValidatingType, str):
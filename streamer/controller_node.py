@@ -351,8 +351,7 @@ class ControllerNode(object):
     if not self._nodes:
       return ProcessStatus.Finished
 
-    value = max(node.check_status().value for node in self._nodes)
-    return ProcessStatus(value)
+    return max(node.check_status() for node in self._nodes)
 
   def stop(self) -> None:
     """Stop all nodes."""
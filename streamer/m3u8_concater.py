@@ -17,8 +17,10 @@
 import os
 import re
 import math
-import posixpath
-from typing import List, Dict, Set, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+from typing import List, Dict, Set, Optional, Tuple, Iterable
 from streamer.output_stream import AudioOutputStream, OutputStream, TextOutputStream, VideoOutputStream
 from streamer.bitrate_configuration import VideoCodec, AudioCodec, VideoResolution, AudioChannelLayout
 from streamer.packager_node import PackagerNode
@@ -35,6 +37,10 @@ class MediaPlaylist:
   Keep in mind that a stream variant playlist is also a MediaPlaylist.
   """
   
+  __slots__ = ('stream_info', 'type', 'duration', 'target_duration',
+               '_content', 'codec', 'resolution', 'channel_layout', 'language',
+               '_attributes')
+  
   current_stream_index = 0
   """A number that is shared between all the MediaPlaylist objects to be used
   to generate unique file names in the format 'stream_<current_stream_index>.m3u8'
@@ -42,30 +48,51 @@ class MediaPlaylist:
   
   HEADER_TAGS = ('#EXTM3U', '#EXT-X-VERSION', '#EXT-X-PLAYLIST-TYPE')
   """Common header tags to search for so we don't store them
-  in `MediaPlaylist.content`.  These tags must be defined only one time
+  in `MediaPlaylist._content`.  These tags must be defined only one time
   in a playlist, and written at the top of a media playlist file once.
   """
   
+  SKIPPED_TAGS = HEADER_TAGS + ('#EXT-X-ENDLIST',)
+  """Tags that are dropped while parsing a media playlist.  The header tags
+  and the end-list tag are written back once by `MediaPlaylist.write()`.
+  """
+  
+  READ_BUFFER_SIZE = 1 << 20
+  """The buffer size used to read a whole media playlist.  Long VOD playlists
+  can be several megabytes, and a larger buffer reads them in fewer system
+  calls, which matters most on network file systems.
+  """
+  
   def __init__(self,
                stream_info: Dict[str, str],
                dir_name: Optional[str] = None,
-               output_dir: Optional[str] = None,
+               period_dir: Optional[str] = None,
                streams_map: Optional[Dict[str, OutputStream]] = None):
     """Given a `stream_info` and the `dir_name`, this method finds the media
     playlist file, parses it, and stores relevant parts of the playlist in
-    `self.content`.
+    `self._content`.
     
-    It also updates the segment paths to make it relative to `output_dir`
+    It also updates the segment paths to make it relative to the output
+    directory, using `period_dir`, which is `dir_name` relative to the output
+    directory.
     
     A `streams_map` is used to match this media playlist to its OutputStream
     object.
     """
     
     self.stream_info = stream_info
+    # The TYPE of an #EXT-X-MEDIA playlist, or 'STREAM-INF' for a stream
+    # variant playlist.  Stored once so we don't look it up repeatedly.
+    self.type = stream_info.get('TYPE', 'STREAM-INF')
     self.duration = 0.0
     self.target_duration = 0
+    # The rendered attribute list of this playlist's master playlist tag.
+    # Computed lazily by get_attributes().
+    self._attributes: Optional[str] = None
     
-    self.content = ''
+    # The playlist content is collected as a list of lines and only joined
+    # when needed, to avoid copying the whole string on every append.
+    self._content: List[str] = []
     
     if dir_name is None:
       # Do not read, The content will be added manually.
@@ -75,53 +102,71 @@ class MediaPlaylist:
     # media playlist file with its OutputStream.
     assert streams_map is not None
     
-    period_dir = os.path.relpath(dir_name, output_dir)
-    media_playlist_file = os.path.join(dir_name,
-                                       _unquote(self.stream_info['URI']))
+    assert period_dir is not None
     
-    with open(media_playlist_file) as media_playlist:
-      line = media_playlist.readline()
-      while line:
-        if line.startswith('#EXTINF'):
-          # Add this segment duration to the total duration.
-          # This will be used to re-calculate the average bitrate.
-          self.duration += float(line[len('#EXTINF:'):].split(',', 1)[0])
-          self.content += line
-          line = media_playlist.readline()
-          # If a byterange exists, add it to the content.
-          if line.startswith('#EXT-X-BYTERANGE'):
-            self.content += line
-            line = media_playlist.readline()
-          # Update the segment's URI.
-          self.content += posixpath.join(period_dir ,line)
-        elif line.startswith('#EXT-X-MAP'):
-          # An EXT-X-MAP must have a URI attribute and optionally
-          # a BYTERANGE attribute.
-          attribs = _extract_attributes(line)
-          self.content += '#EXT-X-MAP:URI=' + _quote(
-              posixpath.join(period_dir, _unquote(attribs['URI'])))
-          if attribs.get('BYTERANGE'):
-            self.content += ',BYTERANGE=' + attribs['BYTERANGE']
-          self.content += '\n'
-        elif line.startswith(MediaPlaylist.HEADER_TAGS + ('#EXT-X-ENDLIST',)):
-          # Skip header and end-list tags.
-          pass
-        elif not line.startswith('#EXT'):
-          # Skip comments.
-          pass
-        elif line.startswith('#EXT-X-TARGETDURATION'):
-          self.target_duration = int(line[len('#EXT-X-TARGETDURATION:'):])
+    # Segment URIs written by the packager are relative, so rebasing them is
+    # a plain prefix rather than a posixpath.join() per segment.
+    period_prefix = period_dir.rstrip('/') + '/'
+    media_playlist_file = os.path.join(dir_name, self.stream_info['URI'])
+    
+    # Read the whole playlist in one call rather than line by line.
+    with open(media_playlist_file,
+              buffering=MediaPlaylist.READ_BUFFER_SIZE) as media_playlist:
+      lines = media_playlist.readlines()
+    
+    # The first segment URI, used to find this playlist's OutputStream.
+    first_segment: Optional[str] = None
+    
+    i = 0
+    while i < len(lines):
+      line = lines[i]
+      if line.startswith('#EXTINF'):
+        # Add this segment duration to the total duration.
+        # This will be used to re-calculate the average bitrate.
+        self.duration += float(line[len('#EXTINF:'):].partition(',')[0])
+        self._content.append(line)
+        i += 1
+        # If a byterange exists, add it to the content.
+        if lines[i].startswith('#EXT-X-BYTERANGE'):
+          self._content.append(lines[i])
+          i += 1
+        if first_segment is None:
+          first_segment = lines[i].rstrip('\n')
+        # Update the segment's URI.
+        self._content.append(period_prefix + lines[i])
+      elif line.startswith('#EXT-X-MAP'):
+        # An EXT-X-MAP must have a URI attribute and optionally
+        # a BYTERANGE attribute.
+        attribs = _extract_attributes(line)
+        # The URI is quoted in the tag; strip the quotes, rebase it, and
+        # quote it again.
+        map_uri = period_prefix + _unquote(attribs['URI'])
+        if attribs.get('BYTERANGE'):
+          self._content.append(f'#EXT-X-MAP:URI="{map_uri}",'
+                               f'BYTERANGE={attribs["BYTERANGE"]}\n')
         else:
-          # Store lines that didn't match one of the above cases.
-          # Like ENCRYPTIONKEYS, DISCONTINUITIES, COMMENTS, etc... .
-          self.content += line
-        line = media_playlist.readline()
+          self._content.append(f'#EXT-X-MAP:URI="{map_uri}"\n')
+      elif line.startswith(MediaPlaylist.SKIPPED_TAGS):
+        # Skip header and end-list tags.
+        pass
+      elif not line.startswith('#EXT'):
+        # Skip comments.
+        pass
+      elif line.startswith('#EXT-X-TARGETDURATION'):
+        self.target_duration = int(line[len('#EXT-X-TARGETDURATION:'):])
+      else:
+        # Store lines that didn't match one of the above cases.
+        # Like ENCRYPTIONKEYS, DISCONTINUITIES, COMMENTS, etc... .
+        self._content.append(line)
+      i += 1
     
     # Set the features we need to access easily while performing the concatenation.
     # Features like codec, channel_layout, resolution, etc... .
-    self._set_features(streams_map)
+    self._set_features(streams_map, first_segment)
   
-  def _set_features(self, streams_map: Dict[str, OutputStream]) -> None:
+  def _set_features(self,
+                    streams_map: Dict[str, OutputStream],
+                    first_segment: Optional[str]) -> None:
     """Get the audio and video codecs and other relevant stream features
     from the matching OutputStream in the `streams_map`, this will be used
     in the codec matching process in the concat_xxx() methods, but the codecs
@@ -139,27 +184,15 @@ class MediaPlaylist:
     # #EXT-X-MEDIA in the master playlist, thus there is no solid baseground for 
     # matching the codecs using the information in the master playlist.
     
-    output_stream: Optional[OutputStream] = None
-    lines = self.content.split('\n')
-    # We need to seek to the first line with the tag #EXTINF.  The line after
-    # will have the URI we need, but if we encounter a byterange tag we need to
-    # advance one more line.
-    for i in range(len(lines)):
-      # Don't use the URIs from any tag to try to extract codec information.
-      # We should not rely on the exact structure of file names for this.
-      # Use stream_maps instead.
-      line = lines[i]
-      if line.startswith('#EXTINF'):
-        line = lines[i + 1]
-        if line.startswith('#EXT-X-BYTERANGE'):
-          line = lines[i + 2]
-        file_name = os.path.basename(line)
-        # Index the file_name and don't use dict.get() .
-        # There MUST be a match.
-        output_stream = streams_map[file_name]
-        break
-    
-    assert output_stream, 'No media file found in this media playlist'
+    # `first_segment` is the URI following the first #EXTINF tag, captured
+    # while parsing.  Don't use the URIs from any tag to try to extract codec
+    # information.  We should not rely on the exact structure of file names
+    # for this.  Use stream_maps instead.
+    assert first_segment, 'No media file found in this media playlist'
+    file_name = os.path.basename(first_segment)
+    # Index the file_name and don't use dict.get() .
+    # There MUST be a match.
+    output_stream = streams_map[file_name]
     self.codec = output_stream.codec
     if isinstance(output_stream, VideoOutputStream):
       self.resolution = output_stream.resolution
@@ -172,35 +205,60 @@ class MediaPlaylist:
     elif isinstance(output_stream, TextOutputStream):
       self.language = _unquote(self.stream_info.get('LANGUAGE', '"und"'))
   
+  def get_attributes(self) -> str:
+    """Returns the attributes of `self.stream_info` in the syntax of an
+    #EXT-X-MEDIA or #EXT-X-STREAM-INF tag, sorted by key.
+    
+    The URI is stored unquoted.  It is quoted here for an #EXT-X-MEDIA tag,
+    while a stream variant's URI is written on the line after its tag, so it
+    is left out of the attributes of a stream variant playlist.
+    
+    `self.stream_info` must not be modified after this is first called,
+    as the result is computed once and cached.
+    """
+    
+    if self._attributes is None:
+      attributes = [f'{key}={value}'
+                    for key, value in self.stream_info.items()
+                    if key != 'URI']
+      if self.type != 'STREAM-INF' and 'URI' in self.stream_info:
+        attributes.append(f'URI={_quote(self.stream_info["URI"])}')
+      self._attributes = ','.join(sorted(attributes))
+    return self._attributes
+  
   def write(self, dir_name: str, media_playlist_header: str):
     """Writes a media playlist whose file name is `self.stream_info['URI']`
     in the directory `dir_name`.
     """
     
-    file_path = os.path.join(dir_name, _unquote(self.stream_info['URI']))
+    file_path = os.path.join(dir_name, self.stream_info['URI'])
+    # Stream the content lines to the file rather than joining them into one
+    # string first, so a long playlist is never held in memory twice.
     with open(file_path, 'w') as media_playlist_file:
-      content = media_playlist_header
-      content += '#EXT-X-TARGETDURATION:' + str(self.target_duration) + '\n\n'
-      content += self.content
-      content += '#EXT-X-ENDLIST\n'
-      media_playlist_file.write(content)
+      media_playlist_file.write(media_playlist_header)
+      media_playlist_file.write(
+          f'#EXT-X-TARGETDURATION:{self.target_duration}\n\n')
+      media_playlist_file.writelines(self._content)
+      media_playlist_file.write('#EXT-X-ENDLIST\n')
   
   @staticmethod
   def extract_header(file_path: str) -> str:
     """Extracts the common media playlist header(parts we can't store
-    in `self.content`).  We then write this header once at the top of
+    in `self._content`).  We then write this header once at the top of
     the file when MediaPlaylist.write() is called.
     """
     
-    header = ''
+    header_lines: List[str] = []
     with open(file_path, 'r') as media_playlist:
-      line = media_playlist.readline()
-      while line:
+      for line in media_playlist:
+        # The header tags all come before the first media segment, so there
+        # is no need to read the rest of the playlist.
+        if line.startswith('#EXTINF'):
+          break
         # Capture the M3U tag, PlaylistType, and ExtVersion.
         if line.startswith(MediaPlaylist.HEADER_TAGS):
-          header += line
-        line = media_playlist.readline()
-    return header
+          header_lines.append(line)
+    return ''.join(header_lines)
   
   @staticmethod
   def _similar_stream_info(media_playlists: List['MediaPlaylist']
@@ -214,22 +272,24 @@ class MediaPlaylist:
     assert len(media_playlists), ('There MUST be at least one media playlist'
                                   'to collect its stream information')
     # Get an arbitrary stream info.
-    stream_info = media_playlists[0].stream_info.copy()
-    
-    for key in list(stream_info):
-      for media_playlist in media_playlists:
-        # If a media playlist has a different value for this key, pop it.
-        if media_playlist.stream_info.get(key) != stream_info[key]:
-          stream_info.pop(key)
-          break
-    
-    return stream_info
+    stream_info = media_playlists[0].stream_info
+    # Intersect the (key, value) pairs of all the streams.  dict.items() views
+    # support set operations, so the comparisons run in C.
+    common_items = set(stream_info.items()).intersection(
+        *(media_playlist.stream_info.items()
+          for media_playlist in media_playlists[1:]))
+    
+    # Keep the original key order.
+    return {key: value for key, value in stream_info.items()
+            if (key, value) in common_items}
   
   @staticmethod
-  def _get_bandwidth(var_playlists: List['MediaPlaylist'],
-                     durations: List[float]) -> Dict[str, str]:
-    """A helper method to get the peak and average bandwidth
-    for stream variants.
+  def _get_variant_info(var_playlists: List['MediaPlaylist'],
+                        durations: List[float],
+                        total_duration: float) -> Dict[str, str]:
+    """A helper method to get the peak and average bandwidth and all the
+    possible codecs for a concatenated stream variant, in one pass over the
+    stream variants(in different periods) that will be concatenated.
     
     For the BANDWIDTH we pick the maximum one we have.
     BANDWIDTH = max((BANDWIDTH)s)
@@ -237,44 +297,38 @@ class MediaPlaylist:
     For the AVERAGE-BANDWIDTH we perform a weighted average by duration.
     AVERAGE-BANDWIDTH = (AVERAGE-BANDWIDTH)s . (DURATION)s
                         /sum((DURATION)s)
+    
+    The CODECS are all the codecs present in all the variants.
+    
+    `total_duration` is sum(durations), computed once by the caller since the
+    durations are the same for every stream variant.
     """
     
     band, avg_band = 0, 0.0
+    codec_strings: Set[str] = set()
     for var_playlist, duration in zip(var_playlists, durations):
-      band = max(int(var_playlist.stream_info['BANDWIDTH']), band)
-      avg_band += int(var_playlist.stream_info['AVERAGE-BANDWIDTH']) * duration
+      stream_info = var_playlist.stream_info
+      band = max(int(stream_info['BANDWIDTH']), band)
+      avg_band += int(stream_info['AVERAGE-BANDWIDTH']) * duration
+      codec_strings.update(_unquote(stream_info['CODECS']).split(','))
     
     return {
         'BANDWIDTH': str(band),
-        'AVERAGE-BANDWIDTH': str(math.ceil(avg_band/sum(durations)))
+        'AVERAGE-BANDWIDTH': str(math.ceil(avg_band/total_duration)),
+        'CODECS': _quote(','.join(codec_strings)),
       }
   
   @staticmethod
-  def _get_hls_codec(var_playlists: List['MediaPlaylist']) -> str:
-    """A helper method to get all the possible codecs for a concatenated stream
-    variant, which is all the codecs present in all the variants(in different
-    periods) that will be concatenated.
-    """
-    
-    codec_strings: Set[str] = set()
-    for var_playlist in var_playlists:
-      codec_strings.update(_unquote(
-          var_playlist.stream_info['CODECS']).split(','))
-    
-    return _quote(','.join(codec_string for
-                           codec_string in codec_strings))
-  
-  @staticmethod
-  def _next_unique_name() -> Dict[str, str]:
-    """Returns a unique NAME and URI."""
+  def _set_unique_name(stream_info: Dict[str, str],
+                       with_name: bool = True) -> None:
+    """Writes a unique URI, and NAME if with_name is set, into stream_info."""
     
     stream_name = 'stream_' + str(MediaPlaylist.current_stream_index)
     MediaPlaylist.current_stream_index += 1
     
-    return {
-        'NAME': _quote(stream_name),
-        'URI': _quote(stream_name + '.m3u8')
-      }
+    if with_name:
+      stream_info['NAME'] = _quote(stream_name)
+    stream_info['URI'] = stream_name + '.m3u8'
   
   @staticmethod
   def _max_channels(aud_playlists: List['MediaPlaylist']
@@ -282,17 +336,14 @@ class MediaPlaylist:
     """Returns the maximum channel count in the given audio playlists."""
     
     return {
-        'CHANNELS': _quote(str(max(
-            aud_playlist.channel_layout.max_channels for
-            aud_playlist in aud_playlists
-      )))}
+        'CHANNELS': _quote(str(max(map(
+            attrgetter('channel_layout.max_channels'), aud_playlists))))}
   
   @staticmethod
   def _max_target_dur(media_playlists: List['MediaPlaylist']) -> int:
     """Returns the maximum target duration in the given media playlists."""
     
-    return max(media_playlist.target_duration for
-               media_playlist in media_playlists)
+    return max(map(attrgetter('target_duration'), media_playlists))
   
   @staticmethod
   def _fit_missing_lang(variant_options: List['MediaPlaylist'],
@@ -308,21 +359,22 @@ class MediaPlaylist:
     
     # Set the best_fit to be an arbitrary language for now.
     best_fit = variant_options[0].language
-    language_base = language.split('-', 1)[0]
+    language_base = language.partition('-')[0]
+    # Whether the base of the best fit is the same as the base of the original
+    # language.  Only updated when the best fit changes.
+    best_fit_matches = best_fit.partition('-')[0] == language_base
     
     for variant in variant_options:
-      best_fit_base = best_fit.split('-', 1)[0]
       candidate = variant.language
-      candidate_split = candidate.split('-', 1)
-      candidate_base = candidate_split[0]
-      candidate_is_regional = len(candidate_split) > 1
+      candidate_base, dash, _ = candidate.partition('-')
       # Only kick the previous best fit out when: The base of the candidate 
       # is the same as the base of the original language AND (the base of 
       # the best fit is not the same as the base of the original language
       # OR the candidate is a regional variant).
       if language_base == candidate_base:
-        if language_base != best_fit_base or candidate_is_regional:
+        if not best_fit_matches or dash:
           best_fit = candidate
+          best_fit_matches = True
       # Note that no perfect match would ever occur, as this method 
       # is called only when a perfect match is missing.
     
@@ -346,7 +398,7 @@ class MediaPlaylist:
     All the language un-annotated streams for each period gets concatenated together.
     """
     
-    def non_nones(items: List[Optional[MediaPlaylist]]) -> List[MediaPlaylist]:
+    def non_nones(items: Iterable[Optional[MediaPlaylist]]) -> List[MediaPlaylist]:
       """Return the elements of the list which are not None."""
       
       return [item for item in items if item is not None]
@@ -378,7 +430,7 @@ class MediaPlaylist:
     for i in range(len(all_txt_playlists)):
       # All the language options that we can use to substitute for a missing
       # language in this period.
-      txt_playlist_options = non_nones([division[lg][i] for lg in langs])
+      txt_playlist_options = non_nones(division[lg][i] for lg in langs)
       # We can query `_fit_missing_lang()` only if we have some text
       # streams available, otherwise, we leave them Nones as they are.
       if len(txt_playlist_options):
@@ -390,34 +442,33 @@ class MediaPlaylist:
     
     concat_txt_playlists: List[MediaPlaylist] = []
     for lang, optional_txt_playlists in division.items():
-      stream_info = MediaPlaylist._similar_stream_info(
-          # There must be at least one that isn't None.
-          non_nones(optional_txt_playlists))
+      # There must be at least one that isn't None.
+      txt_playlists = non_nones(optional_txt_playlists)
+      stream_info = MediaPlaylist._similar_stream_info(txt_playlists)
       if lang != 'und':
         # Put the language attribute in case it was removed.
         stream_info['LANGUAGE'] = _quote(lang)
       # Get a unique NAME and URI.
-      stream_info.update(MediaPlaylist._next_unique_name())
+      MediaPlaylist._set_unique_name(stream_info)
       concat_txt_playlist = MediaPlaylist(stream_info)
       # Set the target duration of the concat playlist to the max of 
       # all children playlists.
       concat_txt_playlist.target_duration = MediaPlaylist._max_target_dur(
-          non_nones(optional_txt_playlists))
+          txt_playlists)
       for i, optional_txt_playlist in enumerate(optional_txt_playlists):
         if optional_txt_playlist:
           # If a playlist is there, append it.
-          concat_txt_playlist.content += optional_txt_playlist.content
+          concat_txt_playlist._content.extend(optional_txt_playlist._content)
         else:
           # If no playlist were found for this period, we create a time gap
           # by filling the period's duration with an empty string.
           ext_inf_count = math.ceil(durations[i] /
                                     concat_txt_playlist.target_duration)
-          for _ in range(ext_inf_count):
-            concat_txt_playlist.content += (
-                '#EXTINF:' + str(durations[i] / ext_inf_count) + ',\n' +
-                'data:text/vtt;charset=utf-8,WEBVTT%0A%0A\n')
+          filler = (f'#EXTINF:{durations[i] / ext_inf_count},\n'
+                    'data:text/vtt;charset=utf-8,WEBVTT%0A%0A\n')
+          concat_txt_playlist._content.append(filler * ext_inf_count)
         # Add a discontinuity after each period.
-        concat_txt_playlist.content += '#EXT-X-DISCONTINUITY\n\n'
+        concat_txt_playlist._content.append('#EXT-X-DISCONTINUITY\n\n')
       concat_txt_playlists.append(concat_txt_playlist)
     
     return concat_txt_playlists
@@ -445,54 +496,56 @@ class MediaPlaylist:
         langs.add(aud_playlist.language)
         channels.add(aud_playlist.channel_layout)
     
-    # Create and initialize a division map.
+    # Create a division map.  The entries are created on first use; every
+    # codec/language/channel combination gets filled in for every period below.
     division: Dict[AudioCodec,
                    Dict[str,
                         Dict[AudioChannelLayout,
-                             List['MediaPlaylist']]]] = {}
-    
-    for codec in codecs:
-      division[codec] = {}
-      for lang in langs:
-        division[codec][lang] = {}
-        for channel in channels:
-          division[codec][lang][channel] = []
+                             List['MediaPlaylist']]]] = defaultdict(
+                                 lambda: defaultdict(lambda: defaultdict(list)))
+    # The channel layouts are the same for every period, so sort them once.
+    sorted_channels = sorted(channels, key=AudioChannelLayout.sort_key)
     
     # This logic inside here is done on period basis.
     for aud_playlists in all_aud_playlists:
-      # Initialize a mapping between audio codecs and language to a list of
-      # media playlists with channel layouts available.
-      codec_lang_division: Dict[AudioCodec, Dict[str, List[MediaPlaylist]]] = {}
-      for codec in codecs:
-        codec_lang_division[codec] = {}
-        for lang in langs:
-          codec_lang_division[codec][lang] = []
+      # A mapping between audio codecs and language to a list of media
+      # playlists with channel layouts available.  Only the codec/language
+      # pairs present in this period get an entry.
+      codec_lang_division: Dict[AudioCodec, Dict[str, List[MediaPlaylist]]] = (
+          defaultdict(dict))
       # For every audio playlist in this period, append it to the matching 
       # codec/language.
       for aud_playlist in aud_playlists:
         assert isinstance(aud_playlist.codec, AudioCodec)
-        codec_lang_division[aud_playlist.codec][aud_playlist.language].append(
-            aud_playlist)
-      # Sort and replace the missing languages in the codec_lang_division map.
+        codec_lang_division[aud_playlist.codec].setdefault(
+            aud_playlist.language, []).append(aud_playlist)
+      # Sort the media playlists of each codec/language ascendingly based on
+      # the channel layouts.  This is done once per list, before any of them
+      # is reused as a substitution for a missing language.
+      for lang_division in codec_lang_division.values():
+        for lang_playlists in lang_division.values():
+          lang_playlists.sort(key=attrgetter('channel_layout'))
+      # Replace the missing languages in the codec_lang_division map.
       for codec in codecs:
+        lang_division = codec_lang_division[codec]
         for lang in langs:
           # If this language for this codec in this period has no media playlists
           # for any channel layout, this means that the language itself
           # is missing.  We will try to find a substitution for it.
-          if not len(codec_lang_division[codec][lang]):
-            aud_playlist_options = [codec_lang_division[codec][lang][0] for
-                                    lang in langs
-                                    if len(codec_lang_division[codec][lang])]
+          if lang not in lang_division:
+            aud_playlist_options = [lang_division[option_lang][0] for
+                                    option_lang in langs
+                                    if option_lang in lang_division]
             sub_lang = MediaPlaylist._fit_missing_lang(aud_playlist_options,
                                                        lang)
-            # Replace the empty codec_lang_division[codec][lang] with the
-            # substitution language with the same codec.
-            codec_lang_division[codec][lang] = codec_lang_division[codec][sub_lang]
-          # Sort the media playlists ascendingly based on the channel layouts.
-          codec_lang_division[codec][lang].sort(key=lambda pl: pl.channel_layout)
+            # Use the playlists of the substitution language with the same
+            # codec for the missing language.
+            lang_division[lang] = lang_division[sub_lang]
+          lang_playlists = lang_division[lang]
+          channel_division = division[codec][lang]
           # Fill the division map for the current period from the codec_lang_division map.
-          for i, channel in enumerate(sorted(channels)):
-            division[codec][lang][channel].append(
+          for i, channel in enumerate(sorted_channels):
+            channel_division[channel].append(
                 # We will try to append the ith audio playlist which has
                 # channel layout of `channel`(the for loop variable), but
                 # if we don't have the ith audio playlist, we can substitute
@@ -500,8 +553,7 @@ class MediaPlaylist:
                 # This would be an optimal substitution since it is performed only
                 # at the higher channel layouts, while the lower channel layouts
                 # MUST always align since they had a shared pipeline configuration.
-                codec_lang_division[codec][lang][min(
-                    i, len(codec_lang_division[codec][lang]) - 1)])
+                lang_playlists[min(i, len(lang_playlists) - 1)])
     
     return division
   
@@ -524,7 +576,7 @@ class MediaPlaylist:
             # Put the language attribute in case it was removed.
             stream_info['LANGUAGE'] = _quote(lang)
           # Get a unique file name.
-          stream_info.update(MediaPlaylist._next_unique_name())
+          MediaPlaylist._set_unique_name(stream_info)
           # Set the max channels for this playlist.
           stream_info.update(MediaPlaylist._max_channels(aud_playlists))
           concat_aud_playlist = MediaPlaylist(stream_info)
@@ -532,9 +584,9 @@ class MediaPlaylist:
           concat_aud_playlist.target_duration = MediaPlaylist._max_target_dur(
               aud_playlists)
           for aud_playlist in aud_playlists:
-            concat_aud_playlist.content += aud_playlist.content
+            concat_aud_playlist._content.extend(aud_playlist._content)
             # Add a discontinuity after each period.
-            concat_aud_playlist.content += '#EXT-X-DISCONTINUITY\n\n'
+            concat_aud_playlist._content.append('#EXT-X-DISCONTINUITY\n\n')
           concat_aud_playlists.append(concat_aud_playlist)
     
     return concat_aud_playlists
@@ -550,14 +602,17 @@ class MediaPlaylist:
     pair: Dict[MediaPlaylist, MediaPlaylist] = {}
     for aud_playlists, var_playlists in zip(all_aud_playlists,
                                             all_var_playlists):
+      # Index this period's stream variants by URI.
+      var_playlists_by_uri = {var_playlist.stream_info['URI']: var_playlist
+                              for var_playlist in var_playlists}
       for aud_playlist in aud_playlists:
-        # Search for the matching stream variant.
-        for var_playlist in var_playlists:
-          if var_playlist.stream_info['URI'] == aud_playlist.stream_info['URI']:
-            pair[aud_playlist] = var_playlist
-            break
+        # Look up the matching stream variant.
+        var_playlist = var_playlists_by_uri.get(aud_playlist.stream_info['URI'])
+        if var_playlist is not None:
+          pair[aud_playlist] = var_playlist
     
     division = MediaPlaylist.concat_aud_common(all_aud_playlists)
+    total_duration = sum(durations)
     
     concat_aud_only_playlists: List[MediaPlaylist] = []
     for codec, lang_channel_div in division.items():
@@ -571,7 +626,7 @@ class MediaPlaylist:
             # Put the language attribute in case it was removed.
             stream_info['LANGUAGE'] = _quote(lang)
           # Get a unique file name.
-          stream_info.update(MediaPlaylist._next_unique_name())
+          MediaPlaylist._set_unique_name(stream_info)
           # Set the max channels for this playlist.
           stream_info.update(MediaPlaylist._max_channels(aud_playlists))
           concat_aud_playlist = MediaPlaylist(stream_info)
@@ -580,23 +635,23 @@ class MediaPlaylist:
           # The URI for the concatenated variant playlist will be the same as
           # the concatenated audio playlist.
           stream_info['URI'] = concat_aud_playlist.stream_info['URI']
-          # Get the peak and average bandwidth across all periods
-          # for this codec-language-channel triad.
-          stream_info.update(MediaPlaylist._get_bandwidth(var_playlists,
-                                                          durations))
-          # Get the codecs from the associated stream variant playlists.
-          stream_info['CODECS'] = MediaPlaylist._get_hls_codec(var_playlists)
+          # Get the peak and average bandwidth across all periods for this
+          # codec-language-channel triad, and the codecs from the associated
+          # stream variant playlists.
+          stream_info.update(MediaPlaylist._get_variant_info(var_playlists,
+                                                             durations,
+                                                             total_duration))
           concat_var_playlist = MediaPlaylist(stream_info)
           # Set the target duration.
           concat_aud_playlist.target_duration = MediaPlaylist._max_target_dur(
               aud_playlists)
           for aud_playlist in aud_playlists:
-            concat_aud_playlist.content += aud_playlist.content
+            concat_aud_playlist._content.extend(aud_playlist._content)
             # Add a discontinuity after each period.
-            concat_aud_playlist.content += '#EXT-X-DISCONTINUITY\n\n'
+            concat_aud_playlist._content.append('#EXT-X-DISCONTINUITY\n\n')
           # The audio and the stream variant playlist will be exactly the same.
           concat_var_playlist.target_duration = concat_aud_playlist.target_duration
-          concat_var_playlist.content = concat_aud_playlist.content
+          concat_var_playlist._content = list(concat_aud_playlist._content)
           concat_aud_only_playlists.extend(
               [concat_aud_playlist, concat_var_playlist])
     
@@ -636,6 +691,10 @@ class MediaPlaylist:
       for resolution in resolutions:
         division[codec][resolution] = []
     
+    # The resolutions are the same for every period and codec, so sort them
+    # once.
+    sorted_resolutions = sorted(resolutions, key=VideoResolution.sort_key)
+    
     # In each period do the following:
     for vid_playlists in all_vid_playlists:
       # Initialize a mapping between video codecs and a list of resolutions available.
@@ -648,8 +707,8 @@ class MediaPlaylist:
         codec_division[vid_playlist.codec].append(vid_playlist)
       for codec in codecs:
         # Sort the variants from low resolution to high resolution.
-        codec_division[codec].sort(key=lambda pl: pl.resolution)
-        for i, resolution in enumerate(sorted(resolutions)):
+        codec_division[codec].sort(key=attrgetter('resolution'))
+        for i, resolution in enumerate(sorted_resolutions):
           division[codec][resolution].append(
               # Append the ith resolution if found, else, append the max
               # available resolution.  This would be a valid choice of
@@ -660,27 +719,27 @@ class MediaPlaylist:
               # pick the highest resolution available for it/them.
               codec_division[codec][min(i, len(codec_division[codec]) - 1)])
     
+    total_duration = sum(durations)
     concat_vid_playlists: List[MediaPlaylist] = []
     for codec, resolution_division in division.items():
       for resolution, vid_playlists in resolution_division.items():
         stream_info: Dict[str, str] = MediaPlaylist._similar_stream_info(
         vid_playlists)
         # Get a unique URI.
-        stream_info.update(MediaPlaylist._next_unique_name())
         # NOTE: stream variants don't have a NAME attribute.
-        stream_info.pop('NAME')
-        # Get the peak and average bandwidth for this codec-resolution pair.
-        stream_info.update(MediaPlaylist._get_bandwidth(vid_playlists,
-                                                        durations))
-        # Get all the codecs that will be inside the new variant stream playlist.
-        stream_info['CODECS'] = MediaPlaylist._get_hls_codec(vid_playlists)
+        MediaPlaylist._set_unique_name(stream_info, with_name=False)
+        # Get the peak and average bandwidth for this codec-resolution pair,
+        # and all the codecs that will be inside the new variant stream playlist.
+        stream_info.update(MediaPlaylist._get_variant_info(vid_playlists,
+                                                           durations,
+                                                           total_duration))
         concat_vid_playlist = MediaPlaylist(stream_info)
         concat_vid_playlist.target_duration = MediaPlaylist._max_target_dur(
             vid_playlists)
         for vid_playlist in vid_playlists:
-          concat_vid_playlist.content += vid_playlist.content
+          concat_vid_playlist._content.extend(vid_playlist._content)
           # Add a discontinuity after each period.
-          concat_vid_playlist.content += '#EXT-X-DISCONTINUITY\n\n'
+          concat_vid_playlist._content.append('#EXT-X-DISCONTINUITY\n\n')
         concat_vid_playlists.append(concat_vid_playlist)
     
     return concat_vid_playlists
@@ -689,6 +748,13 @@ class MediaPlaylist:
 class MasterPlaylist:
   """A class representing a master playlist."""
   
+  __slots__ = ('playlists', 'duration')
+  
+  MEDIA_PLAYLIST_TAGS = ('#EXT-X-MEDIA', '#EXT-X-STREAM-INF')
+  """Tags that reference a media playlist in a master playlist.  Everything
+  before the first of these tags is part of the master playlist header.
+  """
+  
   def __init__(self,
                file_name: Optional[str] = None,
                output_dir: Optional[str] = None,
@@ -719,41 +785,44 @@ class MasterPlaylist:
     # the right output stream for itself.
     streams_map: Dict[str, OutputStream] = {}
     
-    # Add a mapping between single segment file names and their output stream.
-    streams_map.update({
-        outstream.get_single_seg_file().write_end(): outstream
-        for outstream in packager.output_streams
-      })
-    # Add another mapping between the first segment in multi-segment file names
-    # and their corresponding output streams.
-    streams_map.update({
-        outstream.get_media_seg_file()
-        .write_end()
-        .replace('$Number$', '1'): outstream
-        for outstream in packager.output_streams
-      })
+    for outstream in packager.output_streams:
+      # Add a mapping between single segment file names and their output stream.
+      streams_map[outstream.get_single_seg_file().write_end()] = outstream
+      # Add another mapping between the first segment in multi-segment file
+      # names and their corresponding output streams.
+      first_media_seg = outstream.get_media_seg_file().write_end()
+      streams_map[first_media_seg.replace('$Number$', '1')] = outstream
     
     dir_name = os.path.dirname(file_name)
+    # All the media playlists of this master playlist are in the same
+    # directory, so compute its path relative to `output_dir` only once.
+    period_dir = os.path.relpath(dir_name, output_dir)
     
+    # Read the whole master playlist in one call rather than line by line.
     with open(file_name, 'r') as master_playlist:
-      line = master_playlist.readline()
-      while line:
-        if line.startswith('#EXT-X-MEDIA'):
-          stream_info = _extract_attributes(line)
-          self.playlists.append(MediaPlaylist(stream_info, dir_name,
-                                              output_dir,
-                                              streams_map))
-        elif line.startswith('#EXT-X-STREAM-INF'):
-          stream_info = _extract_attributes(line)
-          # Quote the URI to keep consistent,
-          # as the URIs in EXT-X-MEDIA are quoted too.
-          stream_info['URI'] = _quote(master_playlist.readline().strip())
-          self.playlists.append(MediaPlaylist(stream_info, dir_name,
-                                              output_dir,
-                                              streams_map))
-        line = master_playlist.readline()
-      # Get the master playlist duration from an arbitrary stream.
-      self.duration = self.playlists[-1].duration
+      lines = master_playlist.readlines()
+    
+    i = 0
+    while i < len(lines):
+      line = lines[i]
+      if line.startswith('#EXT-X-MEDIA'):
+        stream_info = _extract_attributes(line)
+        # Store the URI unquoted, like the URI of a stream variant.
+        stream_info['URI'] = _unquote(stream_info['URI'])
+        self.playlists.append(MediaPlaylist(stream_info, dir_name,
+                                            period_dir,
+                                            streams_map))
+      elif line.startswith('#EXT-X-STREAM-INF'):
+        stream_info = _extract_attributes(line)
+        i += 1
+        # The URI of a stream variant is on the next line.
+        stream_info['URI'] = lines[i].rstrip('\n')
+        self.playlists.append(MediaPlaylist(stream_info, dir_name,
+                                            period_dir,
+                                            streams_map))
+      i += 1
+    # Get the master playlist duration from an arbitrary stream.
+    self.duration = self.playlists[-1].duration
   
   def write(self, file: str,
             master_playlist_header: str,
@@ -763,30 +832,32 @@ class MasterPlaylist:
     the file system.
     """
     
+    # Split the playlists once into #EXT-X-MEDIA and #EXT-X-STREAM-INF
+    # playlists, so we don't have to check the type of every playlist twice.
+    media_playlists: List[MediaPlaylist] = []
+    var_playlists: List[MediaPlaylist] = []
+    for media_playlist in self.playlists:
+      if media_playlist.type != 'STREAM-INF':
+        media_playlists.append(media_playlist)
+      else:
+        var_playlists.append(media_playlist)
+
     dir_name = os.path.dirname(file)
     with open(file, 'w') as master_playlist:
-      content = master_playlist_header
-      content += comment
+      content: List[str] = [master_playlist_header, comment]
       # Write #EXT-X-MEDIA media playlists first.
-      for media_playlist in self.playlists:
-        if media_playlist.stream_info.get('TYPE'):
-          media_playlist.write(dir_name, media_playlist_header)
-          content += '#EXT-X-MEDIA:' + ','.join(sorted(
-              [key + '=' + value for
-               key, value in media_playlist.stream_info.items()])) + '\n'
-      content += '\n'
+      for media_playlist in media_playlists:
+        media_playlist.write(dir_name, media_playlist_header)
+        content.append(f'#EXT-X-MEDIA:{media_playlist.get_attributes()}\n')
+      content.append('\n')
       # Then write #EXT-X-STREAM-INF media playlists.
-      for media_playlist in self.playlists:
-        if media_playlist.stream_info.get('TYPE') is None:
-          media_playlist.write(dir_name, media_playlist_header)
-          # We don't write the URI in the attributes of a stream
-          # variant playlist.  Pop out the URI.
-          uri = _unquote(media_playlist.stream_info.pop('URI'))
-          content += '#EXT-X-STREAM-INF:' + ','.join(sorted(
-              [key + '=' + value for
-               key, value in media_playlist.stream_info.items()])) + '\n'
-          content += uri + '\n'
-      master_playlist.write(content)
+      for media_playlist in var_playlists:
+        media_playlist.write(dir_name, media_playlist_header)
+        # The URI of a stream variant playlist goes on its own line, after
+        # the attributes.
+        content.append(f'#EXT-X-STREAM-INF:{media_playlist.get_attributes()}\n'
+                       f'{media_playlist.stream_info["URI"]}\n')
+      master_playlist.writelines(content)
   
   @staticmethod
   def extract_headers(file_path: str) -> Tuple[str, str]:
@@ -795,25 +866,29 @@ class MasterPlaylist:
     this master playlist.
     """
     
-    header = ''
+    header_lines: List[str] = []
     with open(file_path, 'r') as master_playlist_file:
-      line = master_playlist_file.readline()
       # Store each line in header until one of these tags is encountered.
-      while line and not line.startswith(('#EXT-X-MEDIA', '#EXT-X-STREAM-INF')):
+      for line in master_playlist_file:
+        if line.startswith(MasterPlaylist.MEDIA_PLAYLIST_TAGS):
+          break
         # lstrip() will convert empty lines -> '' but will keep non-empty lines unchanged.
-        header += line.lstrip()
-        line = master_playlist_file.readline()
+        header_lines.append(line.lstrip())
       else:
-        # Use this media playlist to also extract the MediaPlaylist header.
-        if line.startswith('#EXT-X-MEDIA'):
-          uri = _unquote(_extract_attributes(line)['URI'])
-        elif line.startswith('#EXT-X-STREAM-INF'):
-          uri = master_playlist_file.readline().strip()
-        else:
-          raise RuntimeError('No media playlist found in this master playlist')
-        master_playlist_dirname = os.path.dirname(file_path)
-        media_playlist_path = os.path.join(master_playlist_dirname, uri)
-        return header, MediaPlaylist.extract_header(media_playlist_path)
+        raise RuntimeError('No media playlist found in this master playlist')
+      
+      # Use this media playlist to also extract the MediaPlaylist header.
+      if line.startswith('#EXT-X-MEDIA'):
+        # The URI attribute is quoted; strip the quotes.
+        uri = _unquote(_extract_attributes(line)['URI'])
+      else:
+        # The URI of a stream variant is on the next line.
+        uri = next(master_playlist_file, '').rstrip('\n')
+    
+    master_playlist_dirname = os.path.dirname(file_path)
+    media_playlist_path = os.path.join(master_playlist_dirname, uri)
+    return (''.join(header_lines),
+            MediaPlaylist.extract_header(media_playlist_path))
   
   @staticmethod
   def concat_master_playlists(
@@ -852,18 +927,21 @@ class MasterPlaylist:
       txt_playlists: List['MediaPlaylist'] = []
       aud_playlists: List['MediaPlaylist'] = []
       var_playlists: List['MediaPlaylist'] = []
+      # Map each playlist TYPE to its bucket, so that classifying a playlist
+      # is a single dict lookup.
+      playlists_by_type: Dict[str, List['MediaPlaylist']] = {
+          'SUBTITLES': txt_playlists,
+          'AUDIO': aud_playlists,
+          'STREAM-INF': var_playlists,
+        }
       
       for media_playlist in master_playlist.playlists:
-        stream_type = media_playlist.stream_info.get('TYPE', 'STREAM-INF')
-        if stream_type == 'SUBTITLES':
-          txt_playlists.append(media_playlist)
-        elif stream_type == 'AUDIO':
-          aud_playlists.append(media_playlist)
-        elif stream_type == 'STREAM-INF':
-          var_playlists.append(media_playlist)
-        else:
+        bucket = playlists_by_type.get(media_playlist.type)
+        if bucket is None:
           # TODO: We need a case for CLOSED-CAPTIONS(CC).
-          raise RuntimeError("TYPE={} is not recognized".format(stream_type))  
+          raise RuntimeError("TYPE={} is not recognized".format(
+              media_playlist.type))
+        bucket.append(media_playlist)
       
       all_txt_playlists.append(txt_playlists)
       all_aud_playlists.append(aud_playlists)
@@ -896,6 +974,9 @@ class MasterPlaylist:
 class HLSConcater:
   """A class that serves as an API for the m3u8 concatenation methods."""
   
+  __slots__ = ('_master_playlist_header', '_media_playlist_header',
+               '_output_location', '_master_playlist_sources')
+  
   def __init__(self,
                sample_master_playlist_path: str,
                output_location: str):
@@ -914,17 +995,16 @@ class HLSConcater:
           sample_master_playlist_path)
     # Will be used when writing the concatenated playlists.
     self._output_location = output_location
-    self._all_master_playlists: List[MasterPlaylist] = []
+    # The master playlists are only read when concat_and_write() is called,
+    # so they can be read in parallel.
+    self._master_playlist_sources: List[Tuple[str, PackagerNode]] = []
     
   def add(self, master_playlist_path: str, packager_node: PackagerNode):
     """Adds a master playlist to the HLSConcater object, to be concatented
     in order when HLSConcater.concat() is called.
     """
     
-    self._all_master_playlists.append(
-        MasterPlaylist(master_playlist_path,
-                       self._output_location,
-                       packager_node))
+    self._master_playlist_sources.append((master_playlist_path, packager_node))
   
   def concat_and_write(self, master_playlist_file_name: str, comment: str = ''):
     """Starts concatenating the added master playlists producing one
@@ -934,8 +1014,22 @@ class HLSConcater:
     passed to the constructor.
     """
     
+    def read_master_playlist(source: Tuple[str, PackagerNode]
+                             ) -> MasterPlaylist:
+      master_playlist_path, packager_node = source
+      return MasterPlaylist(master_playlist_path,
+                            self._output_location,
+                            packager_node)
+    
+    # Reading the playlists is mostly file I/O, so overlap it in threads.
+    # executor.map() keeps the results in the order they were added.
+    max_workers = max(1, min(32, len(self._master_playlist_sources)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      all_master_playlists = list(executor.map(read_master_playlist,
+                                               self._master_playlist_sources))
+    
     concated_master_playlist = MasterPlaylist.concat_master_playlists(
-        self._all_master_playlists)
+        all_master_playlists)
     
     if comment:
       comment = '## ' + comment + '\n\n'
@@ -947,19 +1041,17 @@ class HLSConcater:
                                    comment)
 
 
+_ATTRIBUTE_RE = re.compile(r'([-A-Z]+)=("[^"]*"|[^",]*),')
+"""Matches one KEY=VALUE, pair in the attribute list of an m3u8 #EXT-X tag."""
+
 def _extract_attributes(line: str) -> Dict[str, str]:
   """Extracts attributes from an m3u8 #EXT-X tag to a python dictionary."""
   
-  attributes: Dict[str, str] = {}
   line = line.strip().split(':', 1)[1]
   # For a tighter search, append ',' and search for it in the regex.
   line += ','
   # Search for all KEY=VALUE,
-  matches: List[Tuple[str, str]] = re.findall(
-      r'([-A-Z]+)=("[^"]*"|[^",]*),', line)
-  for key, value in matches:
-    attributes[key] = value
-  return attributes
+  return dict(_ATTRIBUTE_RE.findall(line))
 
 def _quote(string: str) -> str:
   """Puts a string in double quotes."""
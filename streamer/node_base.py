@@ -21,14 +21,13 @@ import shlex
 import subprocess
 import sys
 import threading
-import time
 import traceback
 
-from . import node_base
 from typing import Any, Dict, IO, List, Optional, Union
 
-class ProcessStatus(enum.Enum):
-  # Use number values so we can sort based on value.
+class ProcessStatus(enum.IntEnum):
+  # Use number values so we can sort based on value.  As an IntEnum, statuses
+  # compare directly as integers.
 
   Finished = 0
   """The node has completed its task and shut down."""
@@ -81,22 +80,29 @@ class NodeBase(object):
     Returns:
       The Popen object of the subprocess.
     """
-    if merge_env:
-      child_env = os.environ.copy()
-      child_env.update(env)
+    child_env: Optional[Dict[str, str]]
+    if merge_env and not env:
+      # Nothing to add, so let the child inherit our environment as it is,
+      # without copying it.
+      child_env = None
+    elif merge_env:
+      child_env = {**os.environ, **env}
     else:
       child_env = env
 
     # Print arguments formatted as output from bash -x would be.
     # This makes it easy to see the arguments and easy to copy/paste them for
     # debugging in a shell.
+    # These are explicit checks rather than asserts, so that they still hold
+    # under python -O.
     if shell:
-      assert isinstance(args, str)
+      if not isinstance(args, str):
+        raise TypeError('args must be a string when shell is True')
       print('+ ' + args)
     else:
-      assert type(args) is list
-      print('+ ' + ' '.join([shlex.quote(arg) for arg in args]))
-
+      if not isinstance(args, list):
+        raise TypeError('args must be a list when shell is False')
+      print('+ ' + shlex.join(args))
 
     return subprocess.Popen(args,
                             env=child_env,
@@ -124,11 +130,10 @@ class NodeBase(object):
       # Slightly more polite than kill.  Try this first.
       self._process.terminate()
 
-      if self.check_status() == ProcessStatus.Running:
-        # If it's not dead yet, wait 1 second.
-        time.sleep(1)
-
-      if self.check_status() == ProcessStatus.Running:
+      try:
+        # Give it up to 1 second to exit.  This returns as soon as it does.
+        self._process.wait(timeout=1)
+      except subprocess.TimeoutExpired:
         # If it's still not dead, use kill.
         self._process.kill()
         # Wait for the process to die and read its exit code.  There is no way
@@ -136,7 +141,7 @@ class NodeBase(object):
         # this, it can create a zombie process.
         self._process.wait()
 
-class PolitelyWaitOnFinish(node_base.NodeBase):
+class PolitelyWaitOnFinish(NodeBase):
   """A mixin that makes stop() wait for the subprocess if status is Finished.
 
   This is as opposed to the base class behavior, in which stop() forces
@@ -203,6 +208,9 @@ class ThreadedNodeBase(NodeBase):
 
   def start(self) -> None:
     self._status = ProcessStatus.Running
+    # The event is left set by a previous stop(), which would make every wait
+    # return immediately and turn the thread into a busy loop.
+    self._sleep_waker_event.clear()
     self._thread = threading.Thread(target=self._thread_main, name=self._thread_name)
     self._thread.start()
 
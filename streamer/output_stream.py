@@ -23,6 +23,37 @@ from typing import Dict, Union
 class OutputStream(object):
   """Base class for output streams."""
 
+  __slots__ = ('type', 'skip_transcoding', 'input', 'features', 'codec',
+               'ipc_pipe')
+
+  INIT_SEGMENT = {
+    MediaType.AUDIO: 'audio_{language}_{channels}c_{bitrate}_{codec}_init.{format}',
+    MediaType.VIDEO: 'video_{resolution_name}_{bitrate}_{codec}_init.{format}',
+    MediaType.TEXT: 'text_{language}_init.{format}',
+  }
+  """File name templates for the init segment of each media type."""
+
+  MEDIA_SEGMENT = {
+    MediaType.AUDIO: 'audio_{language}_{channels}c_{bitrate}_{codec}_$Number$.{format}',
+    MediaType.VIDEO: 'video_{resolution_name}_{bitrate}_{codec}_$Number$.{format}',
+    MediaType.TEXT: 'text_{language}_$Number$.{format}',
+  }
+  """File name templates for the media segments of each media type."""
+
+  SINGLE_SEGMENT = {
+    MediaType.AUDIO: 'audio_{language}_{channels}c_{bitrate}_{codec}.{format}',
+    MediaType.VIDEO: 'video_{resolution_name}_{bitrate}_{codec}.{format}',
+    MediaType.TEXT: 'text_{language}.{format}',
+  }
+  """File name templates for single-segment output of each media type."""
+
+  IDENTIFICATION = {
+    MediaType.AUDIO: '{language}_{channels}c_{bitrate}_{codec}_{format}',
+    MediaType.VIDEO: '{resolution_name}_{bitrate}_{codec}_{format}',
+    MediaType.TEXT: '{language}_{format}',
+  }
+  """Templates for a string that identifies a stream of each media type."""
+
   def __init__(self,
                type: MediaType,
                input: Input,
@@ -62,43 +93,26 @@ class OutputStream(object):
     return False
 
   def get_init_seg_file(self) -> Pipe:
-    INIT_SEGMENT = {
-      MediaType.AUDIO: 'audio_{language}_{channels}c_{bitrate}_{codec}_init.{format}',
-      MediaType.VIDEO: 'video_{resolution_name}_{bitrate}_{codec}_init.{format}',
-      MediaType.TEXT: 'text_{language}_init.{format}',
-    }
-    path_templ = INIT_SEGMENT[self.type].format(**self.features)
+    path_templ = OutputStream.INIT_SEGMENT[self.type].format_map(self.features)
     return Pipe.create_file_pipe(path_templ, mode='w')
 
   def get_media_seg_file(self) -> Pipe:
-    MEDIA_SEGMENT = {
-      MediaType.AUDIO: 'audio_{language}_{channels}c_{bitrate}_{codec}_$Number$.{format}',
-      MediaType.VIDEO: 'video_{resolution_name}_{bitrate}_{codec}_$Number$.{format}',
-      MediaType.TEXT: 'text_{language}_$Number$.{format}',
-    }
-    path_templ = MEDIA_SEGMENT[self.type].format(**self.features)
+    path_templ = OutputStream.MEDIA_SEGMENT[self.type].format_map(self.features)
     return Pipe.create_file_pipe(path_templ, mode='w')
 
   def get_single_seg_file(self) -> Pipe:
-    SINGLE_SEGMENT = {
-      MediaType.AUDIO: 'audio_{language}_{channels}c_{bitrate}_{codec}.{format}',
-      MediaType.VIDEO: 'video_{resolution_name}_{bitrate}_{codec}.{format}',
-      MediaType.TEXT: 'text_{language}.{format}',
-    }
-    path_templ = SINGLE_SEGMENT[self.type].format(**self.features)
+    path_templ = OutputStream.SINGLE_SEGMENT[self.type].format_map(
+        self.features)
     return Pipe.create_file_pipe(path_templ, mode='w')
 
   def get_identification(self) -> str:
-    SINGLE_SEGMENT = {
-      MediaType.AUDIO: '{language}_{channels}c_{bitrate}_{codec}_{format}',
-      MediaType.VIDEO: '{resolution_name}_{bitrate}_{codec}_{format}',
-      MediaType.TEXT: '{language}_{format}',
-    }
-    return SINGLE_SEGMENT[self.type].format(**self.features)
+    return OutputStream.IDENTIFICATION[self.type].format_map(self.features)
 
 
 class AudioOutputStream(OutputStream):
 
+  __slots__ = ('layout', '_bitrate')
+
   def __init__(self,
                input: Input,
                pipe_dir: str,
@@ -109,6 +123,8 @@ class AudioOutputStream(OutputStream):
     # Override the codec type and specify that it's an audio codec
     self.codec: AudioCodec = codec
     self.layout = channel_layout
+    # The layout and codec are fixed, so look up the bitrate only once.
+    self._bitrate = self.layout.bitrates[self.codec]
 
     # The features that will be used to generate the output filename.
     self.features = {
@@ -121,11 +137,13 @@ class AudioOutputStream(OutputStream):
 
   def get_bitrate(self) -> str:
     """Returns the bitrate for this stream."""
-    return self.layout.bitrates[self.codec]
+    return self._bitrate
 
 
 class VideoOutputStream(OutputStream):
 
+  __slots__ = ('resolution', '_bitrate')
+
   def __init__(self,
                input: Input,
                pipe_dir: str,
@@ -135,6 +153,8 @@ class VideoOutputStream(OutputStream):
     # Override the codec type and specify that it's an audio codec
     self.codec: VideoCodec = codec
     self.resolution = resolution
+    # The resolution and codec are fixed, so look up the bitrate only once.
+    self._bitrate = self.resolution.bitrates[self.codec]
 
     # The features that will be used to generate the output filename.
     self.features = {
@@ -146,11 +166,13 @@ class VideoOutputStream(OutputStream):
 
   def get_bitrate(self) -> str:
     """Returns the bitrate for this stream."""
-    return self.resolution.bitrates[self.codec]
+    return self._bitrate
 
 
 class TextOutputStream(OutputStream):
 
+  __slots__ = ()
+
   def __init__(self,
                input: Input,
                pipe_dir: str,
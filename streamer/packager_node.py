@@ -69,6 +69,10 @@ class PackagerNode(node_base.PolitelyWaitOnFinish):
     self.output_location: str = output_location
     self._segment_dir: str = build_path(
         output_location, pipeline_config.segment_folder)
+    self._mpd_output: str = build_path(
+        output_location, pipeline_config.dash_output)
+    self._hls_output: str = build_path(
+        output_location, pipeline_config.hls_output)
     self.output_streams: List[OutputStream] = output_streams
     self._index = index
     # If a hermetic packager is passed, use it.
@@ -93,6 +97,12 @@ class PackagerNode(node_base.PolitelyWaitOnFinish):
         '--use_dovi_supplemental_codecs',
     ]
 
+    if self._pipeline_config.io_block_size:
+      args += [
+          # Block size for threaded I/O, in bytes.
+          '--io_block_size', str(self._pipeline_config.io_block_size),
+      ]
+
     if self._pipeline_config.streaming_mode == StreamingMode.LIVE:
       args += [
           # Number of seconds the user can rewind through backwards.
@@ -134,50 +144,53 @@ class PackagerNode(node_base.PolitelyWaitOnFinish):
         stdout=stdout)
 
   def _setup_stream(self, stream: OutputStream) -> str:
-    dict = {
+    stream_input = stream.input
+    pipeline_config = self._pipeline_config
+
+    opts = {
         'in': stream.ipc_pipe.read_end(),
         'stream': stream.type.value,
     }
 
-    if stream.input.skip_encryption:
-      dict['skip_encryption'] = str(stream.input.skip_encryption)
+    if stream_input.skip_encryption:
+      opts['skip_encryption'] = str(stream_input.skip_encryption)
 
     if stream.type == MediaType.AUDIO:
-      dict['hls_group_id'] = str(cast(AudioCodec, stream.codec).value)
+      opts['hls_group_id'] = str(cast(AudioCodec, stream.codec).value)
 
-    if stream.type == MediaType.VIDEO and self._pipeline_config.generate_iframe_playlist:
-      dict['iframe_playlist_name'] = 'iframe_' + stream.get_identification() + '.m3u8'
+    if stream.type == MediaType.VIDEO and pipeline_config.generate_iframe_playlist:
+      opts['iframe_playlist_name'] = 'iframe_' + stream.get_identification() + '.m3u8'
 
-    if stream.input.drm_label:
-      dict['drm_label'] = stream.input.drm_label
+    if stream_input.drm_label:
+      opts['drm_label'] = stream_input.drm_label
 
-    if stream.input.forced_subtitle:
-      dict['forced_subtitle'] = '1'
+    if stream_input.forced_subtitle:
+      opts['forced_subtitle'] = '1'
 
     # Note: Shaka Packager will not accept 'und' as a language, but Shaka
     # Player will fill that in if the language metadata is missing from the
     # manifest/playlist.
-    if stream.input.language and stream.input.language != 'und':
-      dict['language'] = stream.input.language
+    if stream_input.language and stream_input.language != 'und':
+      opts['language'] = stream_input.language
 
-    if self._pipeline_config.segment_per_file:
-      dict['init_segment'] = build_path(
+    if pipeline_config.segment_per_file:
+      opts['init_segment'] = build_path(
         self._segment_dir,
         stream.get_init_seg_file().write_end())
-      dict['segment_template'] = build_path(
+      opts['segment_template'] = build_path(
         self._segment_dir,
         stream.get_media_seg_file().write_end())
     else:
-      dict['output'] = build_path(
+      opts['output'] = build_path(
         self._segment_dir,
         stream.get_single_seg_file().write_end())
 
     if stream.is_dash_only():
-      dict['dash_only'] = '1'
+      opts['dash_only'] = '1'
 
     # The format of this argument to Shaka Packager is a single string of
     # key=value pairs separated by commas.
-    return ','.join(key + '=' + value for key, value in dict.items())
+    return ','.join([f'{key}={value}' for key, value in opts.items()])
 
   def _setup_manifest_format(self) -> List[str]:
     args: List[str] = []
@@ -186,8 +199,8 @@ class PackagerNode(node_base.PolitelyWaitOnFinish):
       if self._pipeline_config.utc_timings:
         args += [
             '--utc_timings',
-            ','.join(timing.scheme_id_uri + '=' +
-                     timing.value for timing in self._pipeline_config.utc_timings)
+            ','.join([f'{timing.scheme_id_uri}={timing.value}'
+                      for timing in self._pipeline_config.utc_timings])
         ]
 
       if self._pipeline_config.low_latency_dash_mode:
@@ -203,7 +216,7 @@ class PackagerNode(node_base.PolitelyWaitOnFinish):
       args += [
           # Generate DASH manifest file.
           '--mpd_output',
-          build_path(self.output_location, self._pipeline_config.dash_output),
+          self._mpd_output,
       ]
 
     if ManifestFormat.HLS in self._pipeline_config.manifest_format:
@@ -219,21 +232,18 @@ class PackagerNode(node_base.PolitelyWaitOnFinish):
       args += [
           # Generate HLS playlist file(s).
           '--hls_master_playlist_output',
-          build_path(self.output_location, self._pipeline_config.hls_output),
+          self._hls_output,
       ]
 
     return args
 
   def _setup_encryption_keys(self) -> List[str]:
     # Sets up encryption keys for raw encryption mode
-    keys = []
-    for key in self._pipeline_config.encryption.keys:
-      key_str = ''
-      if key.label:
-        key_str = 'label=' + key.label + ':'
-      key_str += 'key_id=' + key.key_id + ':key=' + key.key
-      keys.append(key_str)
-    return keys
+    return [
+        f'label={key.label}:key_id={key.key_id}:key={key.key}' if key.label
+        else f'key_id={key.key_id}:key={key.key}'
+        for key in self._pipeline_config.encryption.keys
+    ]
 
   def _setup_encryption(self) -> List[str]:
     # Sets up encryption of content.
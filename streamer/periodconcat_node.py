@@ -156,19 +156,19 @@ class PeriodConcatNode(ThreadedNodeBase):
         self._output_location,
         self._pipeline_config.dash_output), 'w') as master_dash:
 
-      contents = "<?xml version='1.0' encoding='UTF-8'?>\n"
+      master_dash.write("<?xml version='1.0' encoding='UTF-8'?>\n")
       # TODO: Add Shaka-Packager version to this xml comment.
-      contents += "<!--Generated with https://github.com/shaka-project/shaka-packager -->\n"
-      contents += "<!--Made Multi-Period with https://github.com/shaka-project/shaka-streamer version {} -->\n".format(__version__)
+      master_dash.write("<!--Generated with https://github.com/shaka-project/shaka-packager -->\n")
+      master_dash.write("<!--Made Multi-Period with https://github.com/shaka-project/shaka-streamer version {} -->\n".format(__version__))
 
       # xml.ElementTree replaces the default namespace with 'ns0'.
       # Register the DASH namespace back as the default namespace before converting to string.
       ElementTree.register_namespace('', default_dash_namespace)
       
-      # xml.etree.ElementTree already has an ElementTree().write() method,
-      # but it won't allow putting comments at the begining of the file.
-      contents += ElementTree.tostring(element=concat_mpd, encoding='unicode')
-      master_dash.write(contents)
+      # The comments above are written to the file first, so that the MPD can
+      # then be serialized straight into the file instead of into one big
+      # string.  With the 'unicode' encoding, no XML declaration is written.
+      ElementTree.ElementTree(concat_mpd).write(master_dash, encoding='unicode')
   
   def _hls_concat(self) -> None:
     """Concatenates multiple HLS playlists using #EXT-X-DISCONTINUITY."""
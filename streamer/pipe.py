@@ -24,6 +24,10 @@ from typing import Optional
 class Pipe:
   """A class that represents a pipe."""
 
+  # One Pipe is created for every IPC pipe and for every file path handed to a
+  # node, so keep the instances small.
+  __slots__ = ('_read_pipe_name', '_write_pipe_name', '_thread')
+
   def __init__(self) -> None:
     """Initializes a non-functioning pipe."""
     
@@ -51,7 +55,9 @@ class Pipe:
       pipe._read_pipe_name = r'\\.\pipe\W' + pipe_name
       # The write pipe is connected to a reader process.
       pipe._write_pipe_name = r'\\.\pipe\R' + pipe_name
-      buf_size = 64 * 1024
+      # Every byte goes through the relay thread below, so use a large buffer
+      # to move the stream in fewer ReadFile/WriteFile round trips.
+      buf_size = 1024 * 1024
 
       read_side = win32pipe.CreateNamedPipe(
           pipe._read_pipe_name,
@@ -307,6 +307,14 @@ class PipelineConfig(configuration.Base):
   Must be true for live content.
   """
 
+  io_block_size = configuration.Field(int).cast()
+  """The size in bytes of the blocks Shaka Packager uses for threaded I/O.
+
+  Larger blocks mean fewer reads from the transcoder's pipes for high bitrate
+  streams.  Must be positive.  If not set, Shaka Packager's default of 64KiB
+  is used.
+  """
+
   generate_iframe_playlist = configuration.Field(bool, default=False).cast()
   """If true, the iFrame playlist will be generated."""
 
@@ -356,6 +364,12 @@ class PipelineConfig(configuration.Base):
       raise configuration.MalformedField(
           self.__class__, 'segment_per_file', field, reason)
 
+    if self.io_block_size is not None and self.io_block_size <= 0:
+      reason = 'must be a positive number of bytes'
+      raise configuration.MalformedField(
+          self.__class__, 'io_block_size', self.__class__.io_block_size,
+          reason)
+
   def get_resolutions(self) -> List[bitrate_configuration.VideoResolution]:
     VideoResolution = bitrate_configuration.VideoResolution  # alias
     return [VideoResolution.get_value(name) for name in self.resolutions]
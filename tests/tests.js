@@ -375,6 +375,20 @@ function errorTests() {
         }));
   });
 
+  it('fails when io_block_size is not positive', async () => {
+    const inputConfig = getBasicInputConfig();
+    const pipelineConfig = {
+      streaming_mode: 'vod',
+      io_block_size: 0,
+    };
+
+    await expectAsync(startStreamer(inputConfig, pipelineConfig))
+        .toBeRejectedWith(jasmine.objectContaining({
+          error_type: 'MalformedField',
+          field_name: 'io_block_size',
+        }));
+  });
+
   it('fails when content_id is not a hex string', async () => {
     const inputConfig = getBasicInputConfig();
     const pipelineConfig = {
@@ -1512,6 +1526,41 @@ function multiPeriodTests(manifestUrl, format) {
     // Use (D > 1.9 * length) instead of (D == 2 * length).
     expect(video.duration).toBeGreaterThan(1.9);
   });
+
+  it('can process multiperiod_inputs_list with single-file output ' + format,
+     async() => {
+    const singleInputConfigDict = {
+      'inputs': [
+        {
+          'name': TEST_DIR + 'Sintel.with.subs.mkv',
+          'media_type': 'video',
+          // Keep this test short by only encoding 1s of content.
+          'end_time': '0:01',
+        },
+      ],
+    };
+    const inputConfigDict = {
+      'multiperiod_inputs_list': [
+        singleInputConfigDict,
+        singleInputConfigDict,
+      ],
+    };
+    // With one file per stream, each period's HLS init segment is a byte
+    // range of that file, which the concatenated playlists must keep.
+    const pipelineConfigDict = {
+      'streaming_mode': 'vod',
+      'segment_per_file': false,
+      'resolutions': ['144p'],
+      'audio_codecs': ['aac'],
+      'video_codecs': ['h264'],
+    };
+
+    await startStreamer(inputConfigDict, pipelineConfigDict);
+    await debugManifest(manifestUrl);
+    await player.load(manifestUrl);
+
+    expect(video.duration).toBeGreaterThan(1.9);
+  });
 }
 
 function lowLatencyDashTests(manifestUrl, format) {